@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 # (c) Will Morrow Dec 2024
 # See LICENSE file in this repo for limitations and conditions
-import argparse, enum, random, textwrap
+import argparse, array, enum, random, re
 
 class MazeOpening(enum.IntFlag):
     NORTH = enum.auto()
@@ -11,40 +11,24 @@ class MazeOpening(enum.IntFlag):
 
     @classmethod
     def opposite(cls, direction):
-        match direction:
-            case cls.NORTH:
-                return cls.SOUTH
-            case cls.EAST:
-                return cls.WEST
-            case cls.SOUTH:
-                return cls.NORTH
-            case cls.WEST:
-                return cls.EAST
-            case _:
-                return MazeOpening(0)
-
-class MazeCell(object):
-    def __init__(self, openings=None):
-        if openings is None:
-            self._openings = MazeOpening(0)
-        else:
-            self._openings = openings
-
-    def getOpenings(self):
-        return self._openings
+        if direction is None or not (0 <= direction < len(_OPPOSITE)):
+            return cls(0)
+        return cls(_OPPOSITE[direction])
 
-    def setOpenings(self, newOpenings):
-        self._openings = newOpenings
+# Raw bit values of each direction, for testing against plain ints (such as the cell grid's bytes) without going through IntFlag
+NORTH_BIT = MazeOpening.NORTH.value
+EAST_BIT = MazeOpening.EAST.value
+SOUTH_BIT = MazeOpening.SOUTH.value
+WEST_BIT = MazeOpening.WEST.value
 
-    def block(self, blockFrom):
-        if blockFrom is None or blockFrom == 0:
-            raise Exception('Must block from at least one direction')
-        self._openings = self._openings & (~blockFrom)
+# Opposite direction bit, indexed by a single direction bit; anything that isn't a single direction maps to 0
+_OPPOSITE = (0, SOUTH_BIT, WEST_BIT, 0, NORTH_BIT, 0, 0, 0, EAST_BIT)
 
-    def carve(self, openFrom):
-        if openFrom is None or openFrom == 0:
-            raise Exception('Must open from at least one direction')
-        self._openings = self._openings | openFrom
+def _splitDirections(direction):
+    # Nearly every carve is in a single direction, so skip scanning the bits when only one is set
+    if direction & (direction-1) == 0:
+        return (direction,)
+    return [bit for bit in (NORTH_BIT, EAST_BIT, SOUTH_BIT, WEST_BIT) if direction & bit]
 
 class MazeDefinition(object):
     def __init__(self, width, height, seed, generator, params, allowWrapX=None, allowWrapY=None):
@@ -57,7 +41,13 @@ class MazeDefinition(object):
         self._params = params
         self._allowWrapX = False if allowWrapX is None else allowWrapX
         self._allowWrapY = False if allowWrapY is None else allowWrapY
-        self._cells = [[MazeCell() for y in range(height)] for x in range(width)]
+        # One byte per cell holding its MazeOpening bits, row by row (index is y*width + x)
+        self._cells = bytearray(width*height)
+        # The adjacent column/row in each direction, for carving; -1 marks an edge that can't be crossed
+        self._westOf = [x-1 if x > 0 else (width-1 if self._allowWrapX else -1) for x in range(width)]
+        self._eastOf = [x+1 if x < width-1 else (0 if self._allowWrapX else -1) for x in range(width)]
+        self._northOf = [y-1 if y > 0 else (height-1 if self._allowWrapY else -1) for y in range(height)]
+        self._southOf = [y+1 if y < height-1 else (0 if self._allowWrapY else -1) for y in range(height)]
         self._start = (0, 0)
         self._end = (0, 0)
 
@@ -79,8 +69,23 @@ class MazeDefinition(object):
     def getEnd(self):
         return self._end
 
+    def getRow(self, y):
+        return bytes(self._cells[y*self._width:(y+1)*self._width])
+
+    def setRow(self, y, row):
+        if len(row) != self._width:
+            raise Exception('Row must be exactly as wide as the maze')
+        self._cells[y*self._width:(y+1)*self._width] = row
+
+    # The raw opening bits of every cell as a list of rows, indexed as cells[y][x] to match the row-major layout; each row is a view
+    # onto the maze, so writing to it changes the maze
     def getCells(self):
-        return self._cells
+        view = memoryview(self._cells)
+        return [view[y*self._width:(y+1)*self._width] for y in range(self._height)]
+
+    # The raw opening bits of every cell as one flat view onto the maze, indexed as buffer[y*width + x], for passes over the whole grid
+    def getCellBuffer(self):
+        return memoryview(self._cells)
 
     def getWrapX(self):
         return self._allowWrapX
@@ -99,69 +104,90 @@ class MazeDefinition(object):
         self._end = (x, y)
 
     def wrap(self, val, delta, limit):
-        if not (delta == -1 or delta == 1):
+        # The check is skipped under python -O; modulo already wraps both ends correctly for a step of one
+        if __debug__ and not (delta == -1 or delta == 1):
             raise Exception('Delta must be -1 or 1')
-        if val == 0 and delta < 0:
-            return limit-1
-        if val == limit-1 and delta > 0:
-            return 0
-        return val + delta
+        return (val + delta) % limit
+
+    # The index into the cells of the cell adjacent to (x, y) in a single direction, or -1 if that would cross an edge that doesn't wrap
+    def neighborIndex(self, x, y, opening):
+        if opening == EAST_BIT:
+            otherX = self._eastOf[x]
+            return -1 if otherX < 0 else y*self._width + otherX
+        if opening == WEST_BIT:
+            otherX = self._westOf[x]
+            return -1 if otherX < 0 else y*self._width + otherX
+        if opening == NORTH_BIT:
+            otherY = self._northOf[y]
+            return -1 if otherY < 0 else otherY*self._width + x
+        if opening == SOUTH_BIT:
+            otherY = self._southOf[y]
+            return -1 if otherY < 0 else otherY*self._width + x
+        raise Exception('Didn\'t find other cell when looking for {} at ({:d}, {:d})'.format(opening, x, y))
+
+    # Checks that every direction can be opened from (x, y) before anything is changed, and returns each direction along with its adjacent cell's index
+    def getAdjacent(self, x, y, direction):
+        if (x < 0) or (y < 0) or (x >= self._width) or (y >= self._height):
+            raise Exception('Out of bounds')
+        adjacent = [(opening, self.neighborIndex(x, y, opening)) for opening in _splitDirections(direction)]
+        for (opening, other) in adjacent:
+            if other < 0:
+                raise Exception('Cannot open to out of bounds')
+        return adjacent
 
     def carve(self, x, y, direction):
         if direction is None or direction == 0:
             raise Exception('Must open at least one direction')
-        if (x < 0) or (y < 0) or (x >= self._width) or (y >= self._height):
-            raise Exception('Out of bounds')
-        oobException = Exception('Cannot open to out of bounds')
-        if (x == 0 and MazeOpening.WEST in direction and not self._allowWrapX):
-            raise oobException
-        if (x == self._width-1 and MazeOpening.EAST in direction and not self._allowWrapX):
-            raise oobException
-        if (y == 0 and MazeOpening.NORTH in direction and not self._allowWrapY):
-            raise oobException
-        if (y == self._height-1 and MazeOpening.SOUTH in direction and not self._allowWrapY):
-            raise oobException
+        direction = int(direction)
+        adjacent = self.getAdjacent(x, y, direction)
         # Note here that opening is the direction that the cell at (x, y) will be opening, so we need to open the opposite on every adjacent cell
-        self._cells[x][y].carve(direction)
-        for opening in list(direction):
-            otherCell = None
-            otherDirection = MazeOpening.opposite(opening)
-            match opening:
-                case MazeOpening.NORTH:
-                    otherCell = self._cells[x][self.wrap(y, -1, self._height)]
-                case MazeOpening.EAST:
-                    otherCell = self._cells[self.wrap(x, 1, self._width)][y]
-                case MazeOpening.SOUTH:
-                    otherCell = self._cells[x][self.wrap(y, 1, self._height)]
-                case MazeOpening.WEST:
-                    otherCell = self._cells[self.wrap(x, -1, self._width)][y]
-            if otherCell is None:
-                raise Exception('Didn\'t find other cell when looking for {:s} at (:d, :d)'.format(opening, x, y))
-            otherCell.carve(otherDirection)
+        self._cells[y*self._width + x] |= direction
+        for (opening, other) in adjacent:
+            self._cells[other] |= _OPPOSITE[opening]
+
+    def block(self, x, y, direction):
+        if direction is None or direction == 0:
+            raise Exception('Must block at least one direction')
+        direction = int(direction)
+        adjacent = self.getAdjacent(x, y, direction)
+        # As with carving, the adjacent cell has to have the opposite wall put back up
+        self._cells[y*self._width + x] &= ~direction
+        for (opening, other) in adjacent:
+            self._cells[other] &= ~_OPPOSITE[opening]
 
 class MazeFlipper(object):
+    # Translation tables from a cell's openings to its mirrored openings, built on first use for each (flipX, flipY) pair
+    _flipTables = {}
+
+    def getFlipTable(self, flipX, flipY):
+        table = self._flipTables.get((flipX, flipY))
+        if table is None:
+            table = bytes(self.getNewOpenings(openings, flipX, flipY) for openings in range(256))
+            self._flipTables[(flipX, flipY)] = table
+        return table
+
     def getNewOpenings(self, openings, flipX, flipY):
-        newOpenings = MazeOpening(0)
+        newOpenings = 0
         if flipX:
-            if MazeOpening.EAST in openings:
-                newOpenings = newOpenings | MazeOpening.WEST
-            if MazeOpening.WEST in openings:
-                newOpenings = newOpenings | MazeOpening.EAST
+            if openings & EAST_BIT:
+                newOpenings = newOpenings | WEST_BIT
+            if openings & WEST_BIT:
+                newOpenings = newOpenings | EAST_BIT
         else:
-            if MazeOpening.EAST in openings:
-                newOpenings = newOpenings | MazeOpening.EAST
-            if MazeOpening.WEST in openings:
-                newOpenings = newOpenings | MazeOpening.WEST
+            if openings & EAST_BIT:
+                newOpenings = newOpenings | EAST_BIT
+            if openings & WEST_BIT:
+                newOpenings = newOpenings | WEST_BIT
         if flipY:
-            if MazeOpening.NORTH in openings:
-                newOpenings = newOpenings | MazeOpening.SOUTH
-            if MazeOpening.SOUTH in openings:
-                newOpenings = newOpenings | MazeOpening.NORTH
+            if openings & NORTH_BIT:
+                newOpenings = newOpenings | SOUTH_BIT
+            if openings & SOUTH_BIT:
+                newOpenings = newOpenings | NORTH_BIT
         else:
-            if MazeOpening.NORTH in openings:
-                newOpenings = newOpenings | MazeOpening.NORTH
-            if MazeOpening.SOUTH in openings:
-                newOpenings = newOpenings | MazeOpening.SOUTH
+            if openings & NORTH_BIT:
+                newOpenings = newOpenings | NORTH_BIT
+            if openings & SOUTH_BIT:
+                newOpenings = newOpenings | SOUTH_BIT
         return newOpenings
 
     def flip(self, maze, flipX=None, flipY=None):
@@ -171,22 +197,25 @@ class MazeFlipper(object):
             flipY = False
         if not (flipX or flipY):
             return maze
-        oldCells = maze.getCells()
         (width, height) = maze.getSize()
         toRet = MazeDefinition(width, height, maze.getSeed(), maze.getGenerator(), maze.getParams(), allowWrapX=maze.getWrapX(), allowWrapY=maze.getWrapY())
-        newCells = toRet.getCells()
-        for x in range(width):
-            for y in range(height):
-                reflectX = width-1-x if flipX else x
-                reflectY = height-1-y if flipY else y
-                if (x, y) == maze.getStart():
-                    toRet.setStart(reflectX, reflectY)
-                if (x, y) == maze.getEnd():
-                    toRet.setEnd(reflectX, reflectY)
-                oldCell = oldCells[x][y]
-                newCells[reflectX][reflectY].setOpenings(self.getNewOpenings(oldCell.getOpenings(), flipX, flipY))
+        # Mirror each whole row (and the order of the rows) and remap every cell's openings through a table
+        table = self.getFlipTable(flipX, flipY)
+        for y in range(height):
+            row = maze.getRow(y)
+            toRet.setRow(height-1-y if flipY else y, (row[::-1] if flipX else row).translate(table))
+        (startX, startY) = maze.getStart()
+        (endX, endY) = maze.getEnd()
+        toRet.setStart(width-1-startX if flipX else startX, height-1-startY if flipY else startY)
+        toRet.setEnd(width-1-endX if flipX else endX, height-1-endY if flipY else endY)
         return toRet
 
+# The flipper holds no per-maze state, so the printers share one
+_FLIPPER = MazeFlipper()
+
+def _flipFlags(args):
+    return (args.get('flipX', '').lower() == 'true', args.get('flipY', '').lower() == 'true')
+
 class MazePrinter(object):
     def print(self, mazeDefinition, args):
         raise Exception('Not implemented')
@@ -206,117 +235,105 @@ class PrintoutPrinter(MazePrinter):
         return '{w:d}x{h:d} maze ({seed})\nGenerated by {gen:s} {params:s}'.format(w=width, h=height, seed=seed, gen=generator, params='' if len(params) == 0 else paramsStr)
 
 
+def _verboseCellLines(openings, marker=None):
+    lines = [['+', '-', '+'], ['|', ' ', '|'], ['+' ,'-', '+']]
+
+    if openings & NORTH_BIT:
+        lines[0][1] = ' '
+    if openings & WEST_BIT:
+        lines[1][0] = ' '
+    if openings & EAST_BIT:
+        lines[1][2] = ' '
+    if openings & SOUTH_BIT:
+        lines[2][1] = ' '
+
+    if openings == 0:
+        lines[1][1] = '#'
+    if marker is not None:
+        lines[1][1] = marker
+
+    return tuple(''.join(line) for line in lines)
+
 class VerbosePrintoutPrinter(PrintoutPrinter):
+    # There are only 16 combinations of openings, so render each of them once up front, along with the start- and end-marked versions
+    CELL_LINES = tuple(_verboseCellLines(openings) for openings in range(16))
+    START_LINES = tuple(_verboseCellLines(openings, marker='*') for openings in range(16))
+    END_LINES = tuple(_verboseCellLines(openings, marker='0') for openings in range(16))
+    # Each of the three lines split out on its own; the markers only ever change the middle line
+    TOP_LINES = tuple(lines[0] for lines in CELL_LINES)
+    MIDDLE_LINES = tuple(lines[1] for lines in CELL_LINES)
+    BOTTOM_LINES = tuple(lines[2] for lines in CELL_LINES)
+
     # Since we have to combine these at the line level, output three strings, one for each line
-    def printCell(self, cell, isStart=None, isEnd=None):
-        if isStart is None:
-            isStart = False
-        if isEnd is None:
-            isEnd = False
-        openings = cell.getOpenings()
-        lines = [['+', '-', '+'], ['|', ' ', '|'], ['+' ,'-', '+']]
-
-        if MazeOpening.NORTH in openings:
-            lines[0][1] = ' '
-        if MazeOpening.WEST in openings:
-            lines[1][0] = ' '
-        if MazeOpening.EAST in openings:
-            lines[1][2] = ' '
-        if MazeOpening.SOUTH in openings:
-            lines[2][1] = ' '
-
-        if openings == 0:
-            lines[1][1] = '#'
-        if isStart:
-            lines[1][1] = '*'
+    # (print() works from the split-out line tables instead, and only goes to the marked versions for the start and end cells)
+    def printCell(self, openings, isStart=None, isEnd=None):
         if isEnd:
-            lines[1][1] = '0'
-
-        return [''.join(line) for line in lines]
+            return self.END_LINES[openings]
+        if isStart:
+            return self.START_LINES[openings]
+        return self.CELL_LINES[openings]
 
     def print(self, mazeDefinition, args):
-        flipX = False
-        flipY = False
-        if 'flipX' in args.keys():
-            flipX = True if args['flipX'].lower() == 'true' else False
-        if 'flipY' in args.keys():
-            flipY = True if args['flipY'].lower() == 'true' else False
-        mazeDefinition = MazeFlipper().flip(mazeDefinition, flipX=flipX, flipY=flipY)
+        (flipX, flipY) = _flipFlags(args)
+        if flipX or flipY:
+            mazeDefinition = _FLIPPER.flip(mazeDefinition, flipX=flipX, flipY=flipY)
         (width, height) = mazeDefinition.getSize()
-        cells = mazeDefinition.getCells()
-        start = mazeDefinition.getStart()
-        end = mazeDefinition.getEnd()
+        (startX, startY) = mazeDefinition.getStart()
+        (endX, endY) = mazeDefinition.getEnd()
+        top = self.TOP_LINES.__getitem__
+        middle = self.MIDDLE_LINES.__getitem__
+        bottom = self.BOTTOM_LINES.__getitem__
 
         output = []
         for y in range(height):
-            cellLines = [self.printCell(cells[x][y], isStart=(start == (x,y)), isEnd=(end == (x,y))) for x in range(width)]
-            output.append('\n'.join(''.join(cell[line] for cell in cellLines) for line in range(3)))
+            # Each of the row's three lines comes straight from the openings; the markers are stamped into the middle one
+            row = mazeDefinition.getRow(y)
+            middleLine = list(map(middle, row))
+            if y == startY:
+                middleLine[startX] = self.START_LINES[row[startX]][1]
+            if y == endY:
+                middleLine[endX] = self.END_LINES[row[endX]][1]
+            output.append('\n'.join([''.join(map(top, row)), ''.join(middleLine), ''.join(map(bottom, row))]))
 
         return self.getMetadataHeader(mazeDefinition) + '\n\n' + '\n'.join(output)
 
 class SuccinctPrintoutPrinter(PrintoutPrinter):
-    def top(self, cell):
-        if cell is not None and MazeOpening.NORTH in cell.getOpenings():
-            return '+ '
-        return '+-'
-    def bottom(self, cell):
-        if cell is not None and MazeOpening.SOUTH in cell.getOpenings():
-            return '+ '
-        return '+-'
-
-    def left(self, cell):
-        if cell is not None and MazeOpening.WEST in cell.getOpenings():
-            return ' '
-        return '|'
-
-    def right(self, cell):
-        if cell is not None and MazeOpening.EAST in cell.getOpenings():
-            return ' '
-        return '|'
-
-    def center(self, cell, isStart, isEnd):
-        if isStart:
-            return '*'
-        if isEnd:
-            return '0'
-        if cell.getOpenings() == 0:
-            return '#'
-        return ' '
+    # Translation tables from a cell's raw opening bits to the character drawn for each part of it, so a whole row can be rendered with bytes.translate
+    TOP = bytes(ord(' ') if i & NORTH_BIT else ord('-') for i in range(256))
+    LEFT = bytes(ord(' ') if i & WEST_BIT else ord('|') for i in range(256))
+    CENTER = bytes(ord('#') if i == 0 else ord(' ') for i in range(256))
+
+    def tops(self, row):
+        line = bytearray(b'+' * (2*len(row)+1))
+        line[1::2] = row.translate(self.TOP)
+        return line.decode('ascii')
+
+    def mids(self, row, startX=None, endX=None):
+        line = bytearray(2*len(row)+1)
+        line[0::2] = row.translate(self.LEFT) + row[0:1].translate(self.LEFT)
+        line[1::2] = row.translate(self.CENTER)
+        if endX is not None:
+            line[2*endX+1] = ord('0')
+        if startX is not None:
+            line[2*startX+1] = ord('*')
+        return line.decode('ascii')
 
     def print(self, mazeDefinition, args):
-        flipX = False
-        flipY = False
-        if 'flipX' in args.keys():
-            flipX = True if args['flipX'].lower() == 'true' else False
-        if 'flipY' in args.keys():
-            flipY = True if args['flipY'].lower() == 'true' else False
-        mazeDefinition = MazeFlipper().flip(mazeDefinition, flipX=flipX, flipY=flipY)
+        (flipX, flipY) = _flipFlags(args)
+        if flipX or flipY:
+            mazeDefinition = _FLIPPER.flip(mazeDefinition, flipX=flipX, flipY=flipY)
         (width, height) = mazeDefinition.getSize()
-        cells = mazeDefinition.getCells()
-        start = mazeDefinition.getStart()
-        end = mazeDefinition.getEnd()
+        (startX, startY) = mazeDefinition.getStart()
+        (endX, endY) = mazeDefinition.getEnd()
 
-        output = self.getMetadataHeader(mazeDefinition) + '\n\n'
+        output = []
         for y in range(height):
-            # tops first
-            for x in range(width):
-                cell = cells[x][y]
-                output += self.top(cell)
-            # cap off the tops
-            output += '+\n'
-            # then mids
-            for x in range(width):
-                cell = cells[x][y]
-                isStart = (x, y) == start
-                isEnd = (x, y) == end
-                output += self.left(cell)
-                output += self.center(cell, isStart, isEnd)
-            # cap off the mids
-            output += self.left(cells[0][y]) + '\n'
-        for x in range(width):
-            output += self.top(cells[x][0])
-        output += '+'
-        return output
+            row = mazeDefinition.getRow(y)
+            # tops first, then mids; the right-hand cap of the mids is the left wall of the first cell
+            output.append(self.tops(row))
+            output.append(self.mids(row, startX=startX if y == startY else None, endX=endX if y == endY else None))
+        output.append(self.tops(mazeDefinition.getRow(0)))
+        return self.getMetadataHeader(mazeDefinition) + '\n\n' + '\n'.join(output)
 
 class MazeBoxDefinitionPrinter(MazePrinter):
     PREAMBLE = '''//-------------------------------------------------------
@@ -347,6 +364,12 @@ class MazeBoxDefinitionPrinter(MazePrinter):
 //---------------------------------------------------------
 '''
     INDENT = 3
+    # Translation tables from a cell's raw opening bits to a 1 where a line carries on through it, and the pattern picking out the runs of them
+    EAST_MASK = bytes(1 if i & EAST_BIT else 0 for i in range(256))
+    SOUTH_MASK = bytes(1 if i & SOUTH_BIT else 0 for i in range(256))
+    RUN = re.compile(b'\x01+')
+    # Every straight line and intersection marker, given 1-indexed (x1, y1, x2, y2)
+    LINE = 'maze_line(i, {:d}, {:d}, {:d}, {:d});'
 
     def getMetadataHeader(self, mazeDefinition):
         (width, height) = mazeDefinition.getSize()
@@ -368,7 +391,7 @@ class MazeBoxDefinitionPrinter(MazePrinter):
     def format_linecarve(self, pos0, pos1):
         if not (pos0[0] == pos1[0] or pos0[1] == pos1[1]):
             raise Exception('Lines cannot be diagonal')
-        return 'maze_line(i, {x1:d}, {y1:d}, {x2:d}, {y2:d});'.format(x1=pos0[0]+1, y1=pos0[1]+1, x2=pos1[0]+1, y2=pos1[1]+1)
+        return self.LINE.format(pos0[0]+1, pos0[1]+1, pos1[0]+1, pos1[1]+1)
 
     ## This is the start in our maze generator parlance
     def format_endline(self, pos0, pos1):
@@ -376,10 +399,12 @@ class MazeBoxDefinitionPrinter(MazePrinter):
             raise Exception('End line has to be on the same y')
         minx = min(pos0[0], pos1[0])
         maxx = max(pos0[0], pos1[0])
-        return 'maze_endline(i, {x1:d}, {x2:d}, {y:d});'.format(x1=minx+1, x2=maxx+1, y=pos0[1]+1)
+        return f'maze_endline(i, {minx+1:d}, {maxx+1:d}, {pos0[1]+1:d});'
 
     def format_intersection(self, pos):
-        return 'maze_line(i, {x:d}, {y:d}, {x:d}, {y:d});'.format(x=pos[0]+1, y=pos[1]+1)
+        x = pos[0]+1
+        y = pos[1]+1
+        return self.LINE.format(x, y, x, y)
 
     def format_start(self, pos, width):
         x = pos[0]
@@ -408,85 +433,83 @@ ygrid = {:d};
 '''.format(width, height)
 
     def print(self, mazeDefinition, args):
-        flipX = False
-        flipY = False
-        if 'flipX' in args.keys():
-            flipX = True if args['flipX'].lower() == 'true' else False
-        if 'flipY' in args.keys():
-            flipY = True if args['flipY'].lower() == 'true' else False
-        mazeDefinition = MazeFlipper().flip(mazeDefinition, flipX=flipX, flipY=flipY)
+        (flipX, flipY) = _flipFlags(args)
+        if flipX or flipY:
+            mazeDefinition = _FLIPPER.flip(mazeDefinition, flipX=flipX, flipY=flipY)
         (width, height) = mazeDefinition.getSize()
-        cells = mazeDefinition.getCells()
         start = mazeDefinition.getStart()
-        end = mazeDefinition.getEnd()
         ## We initialize with the preamble, the maze overall size, and the endline (start position)
         output = '\n'.join([self.PREAMBLE,
                 self.getMetadataHeader(mazeDefinition),
                 self.format_gridsize(width, height),
                 'module make_maze(i) {\n'])
-        inner = self.format_start(start, width) + '\n// Maze body'
         intersections = set()
-        lines = []
+        # Line segments as (x1, y1, x2, y2)
+        segments = []
         # We have taken care of the beginning and the carve from the beginning to the next layer, so starting from y=1, run upward
         # We can simplify our generated path map by only outputting carves in straight lines, either vertically or around the circumference of the cylinder
         # Each line can be continuous until it's interrupted by a wall
         # We still need to output intersections or stops, but we don't need duplicates for both x and y, so we use a set of coordinates rather than a list
         # Horizontal lines
         # (y == 0 is used for the start, skip it)
-        for iy in range(height-1):
-            y = iy+1
-            lineStart = None
-            for x in range(width):
-                here = (x, y)
-                cell = cells[x][y]
-                openings = cell.getOpenings()
-                # For horizontal lines, we may have exits to the left or right of the bounds of the maze, so we have to handle them here
-                # We'll just use the x==0 case because it's easier to handle
-                if x == 0 and MazeOpening.WEST in openings:
-                    lineStart = (-1, y)
-                if lineStart is not None: # we're currently making a line
-                    if MazeOpening.EAST not in openings:
-                        # We've hit an end; close this line, add it to the list of lines, and add the endpoints to the set of intersections
-                        lines.append(self.format_linecarve(lineStart, here))
-                        lineStart = None
-                        intersections.add(here)
-                else: # we're not currently making a line
-                    if MazeOpening.EAST in openings:
-                        # we've hit a start; start the line here
-                        lineStart = here
-                        intersections.add(here)
-            if lineStart is not None:
-                # We didn't hit an end before getting to the end of the grid; make a line ending outside the maze
-                lines.append(self.format_linecarve(lineStart, (width, y)))
+        # Translate the whole grid to masks of its east and south openings in one go, then let the regex engine find the runs
+        # in each row/column slice of them
+        cells = mazeDefinition.getCellBuffer().tobytes()
+        eastMask = cells.translate(self.EAST_MASK)
+        southMask = cells.translate(self.SOUTH_MASK)
+        for y in range(1, height):
+            # For horizontal lines, we may have exits to the left or right of the bounds of the maze, so we have to handle them here
+            # We'll just use the x==0 case because it's easier to handle
+            westExit = cells[y*width] & WEST_BIT
+            if westExit and not eastMask[y*width]:
+                # The exit is the whole line; it ends at the first cell
+                segments.append((-1, y, 0, y))
+                intersections.add((0, y))
+            for run in self.RUN.finditer(eastMask, y*width, (y+1)*width):
+                runStart = run.start() - y*width
+                runEnd = run.end() - y*width
+                if runStart == 0 and westExit:
+                    lineStart = -1
+                else:
+                    lineStart = runStart
+                    intersections.add((runStart, y))
+                if runEnd < width:
+                    # We've hit an end; close this line and add the endpoint to the set of intersections
+                    segments.append((lineStart, y, runEnd, y))
+                    intersections.add((runEnd, y))
+                else:
+                    # We didn't hit an end before getting to the end of the grid; make a line ending outside the maze
+                    segments.append((lineStart, y, width, y))
         # Vertical lines
+        # It's not possible to have off-grid lines vertically, so we have very simple logic here
+        # No need to check for exits, those were already taken care of by the horizontal lines
         for x in range(width):
-            lineStart = None
-            for iy in range(height-1):
-                y = iy+1
-                here = (x, y)
-                cell = cells[x][y]
-                openings = cell.getOpenings()
-                # It's not possible to have off-grid lines vertically, so we have very simple logic here
-                # we start a line when there's no line and we end it when there's no opening
-                if lineStart is not None: # we're currently making a line
-                    # No need to check for intersections, those were already taken care of by the horizontal lines
-                    if MazeOpening.SOUTH not in openings:
-                        # We've hit an end; cap the current line and register an intersection
-                        lines.append(self.format_linecarve(lineStart, here))
-                        lineStart = None
-                        intersections.add(here)
-                if lineStart is None and MazeOpening.SOUTH in openings:
-                    lineStart = here
-                    intersections.add(here)
-            if lineStart is not None:
-                # We didn't hit an end before getting to the end of the grid; make a line ending outside the maze
-                lines.append(self.format_linecarve(lineStart, (x, height)))
-        inner += '\n// Lines (' + str(len(lines)) + ')\n' + '\n'.join(lines)
-        inner += '\n// Intersections (' + str(len(intersections)) + ')\n' + '\n'.join(self.format_intersection(s) for s in intersections)
-        output += textwrap.indent(inner, ' '*self.INDENT)
-        output += '\n}'
-
-        return output
+            # Again skip y == 0, so the column's index is one less than y
+            for run in self.RUN.finditer(southMask[width+x::width]):
+                (runStart, runEnd) = run.span()
+                lineStart = runStart+1
+                intersections.add((x, lineStart))
+                if runEnd+1 < height:
+                    # We've hit an end; cap the current line and register an intersection
+                    segments.append((x, lineStart, x, runEnd+1))
+                    intersections.add((x, runEnd+1))
+                else:
+                    # We didn't hit an end before getting to the end of the grid; make a line ending outside the maze
+                    segments.append((x, lineStart, x, height))
+        # Format every segment and intersection with the same LINE string format_linecarve/format_intersection use, skipping their
+        # per-call checks (segments are straight by construction)
+        # Body lines are indented as they're formatted
+        indent = ' '*self.INDENT
+        line = (indent + self.LINE).format
+        lines = [line(x1+1, y1+1, x2+1, y2+1) for (x1, y1, x2, y2) in segments]
+        points = [line(x+1, y+1, x+1, y+1) for (x, y) in intersections]
+        # The body's parts, joined in one go
+        return '\n'.join([output + indent + self.format_start(start, width).replace('\n', '\n' + indent),
+                indent + '// Maze body',
+                f'{indent}// Lines ({len(lines):d})',
+                '\n'.join(lines),
+                f'{indent}// Intersections ({len(points):d})',
+                '\n'.join(points)]) + '\n}'
 
 class ReceiptAccessing(object):
     QUARTER_FILL = str(b'\xb0', 'ibm437')
@@ -560,6 +583,11 @@ class ReceiptMazePrinter(MazePrinter, ReceiptAccessing):
         MazeOpening.SOUTH | MazeOpening.EAST | MazeOpening.WEST: ReceiptAccessing.SSEEWW,
         MazeOpening.NORTH | MazeOpening.SOUTH | MazeOpening.EAST | MazeOpening.WEST: ReceiptAccessing.NNSSEEWW
     }
+    # The same glyphs indexed by the raw opening bits, so lookups skip IntFlag hashing
+    DOUBLE_BAR = tuple(map(DOUBLE_BAR_MAP.get, map(MazeOpening, range(16))))
+    # ...and as a translation table straight to the printer's code page, so whole rows can be rendered as bytes
+    DOUBLE_BAR_BYTES = (''.join(DOUBLE_BAR) + ReceiptAccessing.FULL_BLOCK*240).encode('ibm437')
+
     def getMetadataHeader(self, mazeDefinition):
         (width, height) = mazeDefinition.getSize()
         seed = mazeDefinition.getSeed()
@@ -569,9 +597,8 @@ class ReceiptMazePrinter(MazePrinter, ReceiptAccessing):
         paramsStr = '({:s})'.format(', '.join('{:s}: {:s}'.format(key, value) for (key,value) in sorted(params.items(), key=lambda p: p[0])))
         return '{w:d}x{h:d} maze ({seed})\nGenerated by {gen:s} {params:s}'.format(w=width, h=height, seed=seed, gen=generator, params='' if len(params) == 0 else paramsStr)
 
-    def cell_to_char(self, cell):
-        openings = cell.getOpenings()
-        return self.DOUBLE_BAR_MAP.get(openings, self.FULL_BLOCK)
+    def cell_to_char(self, openings):
+        return self.DOUBLE_BAR[openings] if openings < 16 else self.FULL_BLOCK
 
     def print(self, mazeDefinition, args):
         try:
@@ -584,27 +611,20 @@ class ReceiptMazePrinter(MazePrinter, ReceiptAccessing):
         if width > max_maze_width:
             raise Exception('Maximum maze width is {:d}'.format(max_maze_width))
         printer = NCR7197('/dev/ttyUSB0') # going to have to make some parameters to make this work properly
-        flipX = False
-        flipY = False
-        if 'flipX' in args.keys():
-            flipX = True if args['flipX'].lower() == 'true' else False
-        if 'flipY' in args.keys():
-            flipY = True if args['flipY'].lower() == 'true' else False
-        mazeDefinition = MazeFlipper().flip(mazeDefinition, flipX=flipX, flipY=flipY)
-        cells = mazeDefinition.getCells()
-        start = mazeDefinition.getStart()
-        end = mazeDefinition.getEnd()
-
-        output = self.getMetadataHeader(mazeDefinition)+'\n\n'
+        (flipX, flipY) = _flipFlags(args)
+        if flipX or flipY:
+            mazeDefinition = _FLIPPER.flip(mazeDefinition, flipX=flipX, flipY=flipY)
+        (startX, startY) = mazeDefinition.getStart()
+        (endX, endY) = mazeDefinition.getEnd()
+        table = self.DOUBLE_BAR_BYTES
+        # Render the maze as code page bytes, one mirrored row plus a newline per line, then mark the start and end over the top and decode it all once
+        body = bytearray()
         for y in range(height):
-            line = ''
-            for x in range(width):
-                if (x, y) == start or (x, y) == end:
-                    line += '@' if (x, y) == start else 'X'
-                else:
-                    line += self.cell_to_char(cells[width-1-x][y])
-            output += line + '\n'
-        printer.print(output + '\n'*PRINT_CUT_OFFSET)
+            body += mazeDefinition.getRow(y)[::-1].translate(table)
+            body += b'\n'
+        body[endY*(width+1) + endX] = ord('X')
+        body[startY*(width+1) + startX] = ord('@')
+        printer.print(self.getMetadataHeader(mazeDefinition)+'\n\n' + body.decode('ibm437') + '\n'*PRINT_CUT_OFFSET)
         printer.cut()
         return ''
 
@@ -627,12 +647,22 @@ class DrawableReceiptMazePrinter(MazePrinter, ReceiptAccessing):
         MazeOpening.SOUTH | MazeOpening.EAST | MazeOpening.WEST: ReceiptAccessing.SEW,
         MazeOpening.NORTH | MazeOpening.SOUTH | MazeOpening.EAST | MazeOpening.WEST: ReceiptAccessing.NSEW
     }
-
-    def getWallConnections(self, x, y, field):
-        return ((MazeOpening.NORTH if field[x][y-1] != ' ' else MazeOpening(0))
-                | (MazeOpening.SOUTH if field[x][y+1] != ' ' else MazeOpening(0))
-                | (MazeOpening.EAST if field[x+1][y] != ' ' else MazeOpening(0))
-                | (MazeOpening.WEST if field[x-1][y] != ' ' else MazeOpening(0)))
+    # The same glyphs indexed by the raw bits of the walls that meet at a crossing
+    SINGLE_BAR = tuple(map(SINGLE_BAR_MAP.get, map(MazeOpening, range(16))))
+    # The field is built in the printer's code page, a byte per position, and decoded once at the end
+    SINGLE_BAR_BYTES = ''.join(SINGLE_BAR).encode('ibm437')
+    # Translation table to what fills the center of a cell, by its raw opening bits; a cell with no openings is filled in
+    CENTER_BYTES = (ReceiptAccessing.HALF_FILL + ' '*255).encode('ibm437')
+
+    # For each crossing in the field row starting at rowStart, the walls adjacent to it that are still standing, as opening bits; the field
+    # is laid out as buildField makes it, with a newline ending each row
+    def getWallConnections(self, field, rowStart, fieldWidth):
+        stride = fieldWidth+1
+        space = ord(' ')
+        return [(NORTH_BIT if north != space else 0) | (EAST_BIT if east != space else 0)
+                | (SOUTH_BIT if south != space else 0) | (WEST_BIT if west != space else 0)
+            for (north, east, south, west) in zip(field[rowStart-stride+2:rowStart-stride+fieldWidth-1:2], field[rowStart+3:rowStart+fieldWidth:2],
+                field[rowStart+stride+2:rowStart+stride+fieldWidth-1:2], field[rowStart+1:rowStart+fieldWidth-2:2])]
 
     def getMetadataHeader(self, mazeDefinition):
         (width, height) = mazeDefinition.getSize()
@@ -643,6 +673,61 @@ class DrawableReceiptMazePrinter(MazePrinter, ReceiptAccessing):
         paramsStr = '({:s})'.format(', '.join('{:s}: {:s}'.format(key, value) for (key,value) in sorted(params.items(), key=lambda p: p[0])))
         return '{w:d}x{h:d} maze ({seed})\nGenerated by {gen:s} {params:s}'.format(w=width, h=height, seed=seed, gen=generator, params='' if len(params) == 0 else paramsStr)
 
+    # Lay out the maze as a grid of box-drawing characters in the printer's code page, one byte per position row by row; each row but the last
+    # ends in a newline, so the field is indexed as field[y*(fieldWidth+1) + x] and decodes straight into the text to print. Each cell is
+    # surrounded by a ring of walls and crossings
+    def buildField(self, mazeDefinition):
+        (width, height) = mazeDefinition.getSize()
+        start = mazeDefinition.getStart()
+        end = mazeDefinition.getEnd()
+        encode = lambda glyphs: glyphs.encode('ibm437')
+
+        # Every cell takes up an odd position in the field, with the walls and crossings around it on the even ones
+        field_width = 2*width+1
+        field_height = 2*height+1
+        stride = field_width+1
+        # Draw the walls around every cell (but not the crosses between them) by repeating whole rows; the rows through the cells have
+        # walls between them, and the rows between the cells have walls under them
+        cellRow = encode(self.NNSS + (self.HALF_FILL + self.NS)*(width-1) + self.HALF_FILL + self.NNSS + '\n')
+        wallRow = encode(self.NNSS + (self.EW + self.HALF_FILL)*(width-1) + self.EW + self.NNSS + '\n')
+        field = bytearray(encode(self.SSEE + self.EEWW*(field_width-2) + self.SSWW + '\n')
+                + (cellRow + wallRow)*(height-1) + cellRow
+                + encode(self.NNEE + self.EEWW*(field_width-2) + self.NNWW))
+        bottom = (field_height-1)*stride
+        space = ord(' ')
+        # Fill in the center of every cell a row at a time, then knock out the walls each one opens through
+        for (y, rowStart) in enumerate(range(stride, bottom, 2*stride)):
+            row = mazeDefinition.getRow(y)
+            field[rowStart+1:rowStart+field_width:2] = row.translate(self.CENTER_BYTES)
+            for (index, openings) in zip(range(rowStart+1, rowStart+field_width, 2), row):
+                if not openings:
+                    continue
+                if openings & NORTH_BIT:
+                    field[index-stride] = space
+                if openings & SOUTH_BIT:
+                    field[index+stride] = space
+                if openings & EAST_BIT:
+                    field[index+1] = space
+                if openings & WEST_BIT:
+                    field[index-1] = space
+        # The start wins if it's on the same cell as the end
+        field[(2*end[1]+1)*stride + 2*end[0]+1] = ord('X')
+        field[(2*start[1]+1)*stride + 2*start[0]+1] = ord('@')
+
+        # Now that all the cardinal direction walls are set, we'll do all the crossings, a whole row at a time; each crossing joins
+        # up with whichever of the walls above, right, below and left of it are still standing
+        bar = self.SINGLE_BAR_BYTES
+        (eeww, seeww, neeww, nnsse, nnssw) = encode(self.EEWW + self.SEEWW + self.NEEWW + self.NNSSE + self.NNSSW)
+        field[2:field_width-1:2] = [seeww if wall != space else eeww for wall in field[stride+2:stride+field_width-1:2]]
+        field[bottom+2:bottom+field_width-1:2] = [neeww if wall != space else eeww for wall in field[bottom-stride+2:bottom-stride+field_width-1:2]]
+        for rowStart in range(2*stride, bottom, 2*stride):
+            field[rowStart+2:rowStart+field_width-1:2] = map(bar.__getitem__, self.getWallConnections(field, rowStart, field_width))
+            if field[rowStart+1] != space:
+                field[rowStart] = nnsse
+            if field[rowStart+field_width-2] != space:
+                field[rowStart+field_width-1] = nnssw
+        return field
+
     def print(self, mazeDefinition, args):
         try:
             import ncr7197
@@ -654,124 +739,45 @@ class DrawableReceiptMazePrinter(MazePrinter, ReceiptAccessing):
         if width > max_maze_width:
             raise Exception('Maximum maze width is {:d}'.format(max_maze_width))
         printer = NCR7197('/dev/ttyUSB0') # going to have to make some parameters to make this work properly
-        flipX = False
-        flipY = False
-        if 'flipX' in args.keys():
-            flipX = True if args['flipX'].lower() == 'true' else False
-        if 'flipY' in args.keys():
-            flipY = True if args['flipY'].lower() == 'true' else False
-        mazeDefinition = MazeFlipper().flip(mazeDefinition, flipX=flipX, flipY=flipY)
-        cells = mazeDefinition.getCells()
-        start = mazeDefinition.getStart()
-        end = mazeDefinition.getEnd()
+        (flipX, flipY) = _flipFlags(args)
+        if flipX or flipY:
+            mazeDefinition = _FLIPPER.flip(mazeDefinition, flipX=flipX, flipY=flipY)
 
-        field_transform = lambda v: v*2+1
-        field_width = field_transform(width)
-        field_height = field_transform(height)
-        field = [[self.HALF_FILL for y in range(field_height)] for x in range(field_width)]
-        # Fill in the top and bottom edges, as well as all the intermediate walls except the crosses
-        for x in range(field_width):
-            if x == 0:
-                field[x][0] = self.SSEE
-                field[x][field_height-1] = self.NNEE
-                continue
-            if x == field_width-1:
-                field[x][0] = self.SSWW
-                field[x][field_height-1] = self.NNWW
-                continue
-            field[x][0] = self.EEWW
-            field[x][field_height-1] = self.EEWW
-            if x % 2 == 1:
-                for y in range(2, field_height-1, 2):
-                    field[x][y] = self.EW
-            else:
-                for y in range(1, field_height, 2):
-                    field[x][y] = self.NS
-        
-        # Fill in the left and right edges; intermediates were taken care of already
-        for y in range(field_height):
-            if y == 0 or y == field_height-1:
-                continue
-            field[0][y] = self.NNSS
-            field[field_width-1][y] = self.NNSS
-        for y in range(height):
-            fy = field_transform(y)
-            for x in range(width):
-                loc = (x,y)
-                fx = field_transform(x)
-                cell = cells[x][y]
-                openings = cell.getOpenings()
-                # handle center
-                if start == loc:
-                    field[fx][fy] = '@'
-                elif end == loc:
-                    field[fx][fy] = 'X'
-                else:
-                    if openings == MazeOpening(0):
-                        field[fx][fy] = self.HALF_FILL
-                    else:
-                        field[fx][fy] = ' '
-                # handle top
-                if MazeOpening.NORTH in openings:
-                    field[fx][fy-1] = ' '
-                if MazeOpening.SOUTH in openings:
-                    field[fx][fy+1] = ' '
-                if MazeOpening.EAST in openings:
-                    field[fx+1][fy] = ' '
-                if MazeOpening.WEST in openings:
-                    field[fx-1][fy] = ' '
-
-        # Now that all the cardinal direction walls are set, we'll do all the crossings
-        for x in range(2, field_width-1, 2):
-            if field[x][1] != ' ':
-                field[x][0] = self.SEEWW
-            if field[x][field_height-2] != ' ':
-                field[x][field_height-1] = self.NEEWW
-            for y in range(2, field_height-1, 2):
-                directions = self.getWallConnections(x, y, field)
-                field[x][y] = self.SINGLE_BAR_MAP.get(directions, '!')
-        for y in range(2, field_height-1, 2):
-            if field[1][y] != ' ':
-                field[0][y] = self.NNSSE
-            if field[field_width-2][y] != ' ':
-                field[field_width-1][y] = self.NNSSW
-
-        printer.print(self.getMetadataHeader(mazeDefinition)+'\n\n' + '\n'.join([''.join([field[x][y] for x in range(field_width)]) for y in range(field_height)]) + '\n'*PRINT_CUT_OFFSET)
+        printer.print(self.getMetadataHeader(mazeDefinition)+'\n\n' + self.buildField(mazeDefinition).decode('ibm437') + '\n'*PRINT_CUT_OFFSET)
         printer.cut()
         return 'printed'
 
+# A stand-in for Random.randrange that takes each draw modulo the bound from a block of random words fetched in one call;
+# much cheaper per draw, at the cost of a negligible bias and a different sequence of draws for the same seed
+def _batchedRandrange(rng, batchSize=4096):
+    draws = array.array('I')
+    position = 0
+    def randrange(stop):
+        nonlocal draws, position
+        if position == len(draws):
+            draws = array.array('I')
+            draws.frombytes(rng.randbytes(draws.itemsize*batchSize))
+            position = 0
+        position += 1
+        return draws[position-1] % stop
+    return randrange
+
+# Set to dump the carver's whole state when it bails out, rather than just a summary; that can be a very long line for a big maze
+_CARVER_DEBUG = False
+
 class RandomTipCarverMazeBuilder(object):
     def wraparoundX(self, x, delta, width):
-        if not (delta == -1 or delta == 1):
+        if __debug__ and not (delta == -1 or delta == 1):
             raise Exception('Delta must be either 1 or -1')
-        if x == 0 and delta < 0:
-            return width -1
-        if x == width-1 and delta >0:
-            return 0
-        return x + delta
-
-    def getValidMoves(self, visited, tip, width, height, wrapXAllowed):
-        validMoves = []
-        (x, y) = tip
-        if wrapXAllowed:
-            left = self.wraparoundX(x, -1, width)
-            right = self.wraparoundX(x, 1, width)
-            if not visited[left][y]:
-                validMoves.append( ((left, y), MazeOpening.WEST) )
-            if not visited[right][y]:
-                validMoves.append( ((right, y), MazeOpening.EAST) )
-        else:
-            if x > 0 and not visited[x-1][y]:
-                validMoves.append( ((x-1, y), MazeOpening.WEST) )
-            if x < width-1 and not visited[x+1][y]:
-                validMoves.append( ((x+1, y), MazeOpening.EAST) )
-        if y > 0 and not visited[x][y-1]:
-            validMoves.append( ((x, y-1), MazeOpening.NORTH) )
-        if y < height-1 and not visited[x][y+1]:
-            validMoves.append( ((x, y+1), MazeOpening.SOUTH) )
-        return validMoves
-
-    def generate(self, maze, visited=None, rng=None, wrapXAllowed=None):
+        return (x + delta) % width
+
+    # Neighbor tables for each x; -1 marks an edge that can't be crossed
+    def getNeighborColumns(self, width, wrapXAllowed):
+        leftOf = [self.wraparoundX(x, -1, width) if (wrapXAllowed or x > 0) else -1 for x in range(width)]
+        rightOf = [self.wraparoundX(x, 1, width) if (wrapXAllowed or x < width-1) else -1 for x in range(width)]
+        return (leftOf, rightOf)
+
+    def generate(self, maze, visited=None, rng=None, wrapXAllowed=None, fastRng=None):
         (width, height) = maze.getSize()
         start = maze.getStart()
         end = maze.getEnd()
@@ -779,41 +785,106 @@ class RandomTipCarverMazeBuilder(object):
         if rng is None:
             rng = random.Random(seed)
         if visited is None:
-            visited = [[False for y in range(height)] for x in range(width)]
+            # One byte per cell, laid out like the maze's cells (index is y*width + x)
+            visited = bytearray(width*height)
         if wrapXAllowed is None:
             wrapXAllowed = False
+        if wrapXAllowed and not maze.getWrapX():
+            # Moves are written straight into the cells below, so catch a wrap the maze itself won't allow before carving anything
+            raise Exception('Cannot wrap around in x on a maze that doesn\'t allow it')
+        if fastRng is None:
+            fastRng = False
+        (leftOf, rightOf) = self.getNeighborColumns(width, wrapXAllowed)
         init = (rng.randrange(width), rng.randrange(height))
-        while visited[init[0]][init[1]]:
+        while visited[init[1]*width + init[0]]:
             init = (rng.randrange(width), rng.randrange(height))
-        tips = [init]
+        # The starting cell is part of the maze from the outset; otherwise a later tip could carve back into it and close a loop
+        visited[init[1]*width + init[0]] = 1
+        # Tips (and moves) are kept as indices into the cells, y*width + x
+        # Every cell becomes a tip at most once, so one buffer sized to the maze holds them all; the live tips are tips[:tipCount]
+        tips = array.array('i', [0]) * (width*height)
+        tips[0] = init[1]*width + init[0]
+        tipCount = 1
+        endIndex = end[1]*width + end[0]
         iterations = 0
-        maxIterations = width*height*5
-        # While any unvisited cells exist...
-        while any(not visited[x][y] for x in range(width) for y in range(height)) and len(tips) > 0:
-            iterations+=1
-            if iterations >= maxIterations:
-                print('Iteration {:d} | Infinite loop detected, returning what we have; tips: {:s}\nvisited: {:s}'.format(iterations, str(tips), str(visited)))
-                break
-            if len(tips) == 0:
-                print('Iteration {:d} | No tips exist; visited {:s}'.format(iterations, str(visited)))
-                break
-            tip = rng.choice(tips)
-            tips.remove(tip)
-            validMoves = self.getValidMoves(visited, tip, width, height, wrapXAllowed)
-            if len(validMoves) == 0:
-                continue
-            if len(validMoves) > 1:
-                tips.insert(0, tip)
-            chosen = rng.choice(validMoves)
-            newTip = chosen[0]
-            carveDirection = chosen[1]
-            maze.carve(tip[0], tip[1], carveDirection)
-            visited[newTip[0]][newTip[1]] = True
-            # Ensure the end is always a single-entrance cell
-            if newTip != end:
-                tips.append(newTip)
+        # Every iteration either carves into a new cell or retires a spent tip, and each cell is carved into and retired at most once
+        maxIterations = 2*width*height + 1
+        # Counted once here, then decremented on every carve
+        unvisited = visited.count(0)
+        # The cell and direction of each valid move from the current tip, reused for every tip
+        moveCells = [0]*4
+        moveDirections = [0]*4
+        # fastRng swaps in draws from batched random words; either way the loop calls a local randrange
+        randrange = _batchedRandrange(rng) if fastRng else rng.randrange
+        # Every move is between neighbors already checked below (and any wrap was checked against the maze above), so the openings
+        # are written straight into the maze's cells without going through carve()
+        cells = maze.getCellBuffer()
+        try:
+            # While any unvisited cells exist...
+            while unvisited > 0 and tipCount > 0:
+                iterations+=1
+                if iterations >= maxIterations:
+                    print('Iteration {:d} | Infinite loop detected, returning what we have; {:d} tips, {:d} cells unvisited'.format(iterations, tipCount, unvisited))
+                    if _CARVER_DEBUG:
+                        print('tips: {:s}\nvisited: {:s}'.format(str(tips[:tipCount].tolist()), str(visited)))
+                    break
+                if tipCount == 0:
+                    print('Iteration {:d} | No tips exist; {:d} cells unvisited'.format(iterations, unvisited))
+                    if _CARVER_DEBUG:
+                        print('visited: {:s}'.format(str(visited)))
+                    break
+                # Tips that will still have somewhere to go after this move stay where they are in the list; only spent ones are removed
+                tipIndex = randrange(tipCount)
+                tip = tips[tipIndex]
+                (y, x) = divmod(tip, width)
+                # Gather the unvisited neighbors, in the order west, east, north, south
+                moveCount = 0
+                left = leftOf[x]
+                if left >= 0 and not visited[tip - x + left]:
+                    moveCells[moveCount] = tip - x + left
+                    moveDirections[moveCount] = WEST_BIT
+                    moveCount += 1
+                right = rightOf[x]
+                if right >= 0 and not visited[tip - x + right]:
+                    moveCells[moveCount] = tip - x + right
+                    moveDirections[moveCount] = EAST_BIT
+                    moveCount += 1
+                if y > 0 and not visited[tip - width]:
+                    moveCells[moveCount] = tip - width
+                    moveDirections[moveCount] = NORTH_BIT
+                    moveCount += 1
+                if y < height-1 and not visited[tip + width]:
+                    moveCells[moveCount] = tip + width
+                    moveDirections[moveCount] = SOUTH_BIT
+                    moveCount += 1
+                if moveCount <= 1:
+                    # Order doesn't matter since tips are picked at random, so the last tip fills the hole
+                    tipCount -= 1
+                    tips[tipIndex] = tips[tipCount]
+                if moveCount == 0:
+                    continue
+                move = randrange(moveCount)
+                newTip = moveCells[move]
+                carveDirection = moveDirections[move]
+                cells[tip] |= carveDirection
+                cells[newTip] |= _OPPOSITE[carveDirection]
+                visited[newTip] = 1
+                unvisited -= 1
+                # Ensure the end is always a single-entrance cell
+                if newTip != endIndex:
+                    tips[tipCount] = newTip
+                    tipCount += 1
+        finally:
+            cells.release()
         return maze
 
+# The builder keeps no state between mazes, so the generators share one
+_CARVER = RandomTipCarverMazeBuilder()
+
+# Whether the fastRng generator option is set; it trades the usual maze for a given seed for faster carving
+def _fastRngFlag(args):
+    return args is not None and args.get('fastRng', '').lower() == 'true'
+
 # For use with a cylindrical projection (so x=0 may connect to x=(width-1))
 class MazeBoxGenerator(MazeGenerator):
     SAFE_HEIGHT = 3 # height that must be reserved for the exit line    
@@ -834,22 +905,21 @@ class MazeBoxGenerator(MazeGenerator):
         rng = random.Random(seed)
         start = (rng.randrange(width), 0)
         end = (rng.randrange(width), totalHeight-1)
-        maze = MazeDefinition(width, totalHeight, seed, self.__class__.__name__, {}, allowWrapX=True)
+        fastRng = _fastRngFlag(args)
+        # Recorded in the params so the maze can be reproduced from what's printed with it
+        params = {'fastRng': 'true'} if fastRng else {}
+        maze = MazeDefinition(width, totalHeight, seed, self.__class__.__name__, params, allowWrapX=True)
         maze.setStart(start[0], start[1])
         maze.setEnd(end[0], end[1])
-        visited = [[False for y in range(totalHeight)] for x in range(width)]
+        # Laid out like the maze's cells, so each level is a contiguous slice
+        visited = bytearray(width*totalHeight)
         # seal off (pre-visit) the start level so that we don't try to visit any cell within
-        for x in range(width):
-            if x == start[0]:
-                continue
-            visited[x][start[1]] = True
+        visited[start[1]*width:(start[1]+1)*width] = b'\x01'*width
+        visited[start[1]*width + start[0]] = 0
         # seal off (pre-visit) the end levels except the end cell and the direct line below it
-        for y in range(self.SAFE_HEIGHT):
-            for x in range(width):
-                if x == end[0]:
-                    continue
-                visited[x][totalHeight-(y+1)] = True
-        return RandomTipCarverMazeBuilder().generate(maze, visited=visited, rng=rng, wrapXAllowed=True)
+        visited[(totalHeight-self.SAFE_HEIGHT)*width:] = b'\x01'*(width*self.SAFE_HEIGHT)
+        visited[(totalHeight-self.SAFE_HEIGHT)*width + end[0]::width] = bytes(self.SAFE_HEIGHT)
+        return _CARVER.generate(maze, visited=visited, rng=rng, wrapXAllowed=True, fastRng=fastRng)
 
 class GeneralMazeCarverGenerator(MazeGenerator):
     def generate(self, width, height, seed, args):
@@ -864,10 +934,13 @@ class GeneralMazeCarverGenerator(MazeGenerator):
         end = start
         while start == end:
             end = (rng.randrange(width), rng.randrange(height))
-        maze = MazeDefinition(width, height, seed, self.__class__.__name__, {}, allowWrapX=True)
+        fastRng = _fastRngFlag(args)
+        # Recorded in the params so the maze can be reproduced from what's printed with it
+        params = {'fastRng': 'true'} if fastRng else {}
+        maze = MazeDefinition(width, height, seed, self.__class__.__name__, params, allowWrapX=True)
         maze.setStart(start[0], start[1])
         maze.setEnd(end[0], end[1])
-        return RandomTipCarverMazeBuilder().generate(maze, rng=rng)
+        return _CARVER.generate(maze, rng=rng, fastRng=fastRng)
 
 _keyFunc = lambda clazz: clazz.__name__
 _mazeGenerators = [GeneralMazeCarverGenerator, MazeBoxGenerator]
@@ -875,6 +948,18 @@ _mazePrinters = [VerbosePrintoutPrinter, SuccinctPrintoutPrinter, MazeBoxDefinit
 mazeGenerators = {_keyFunc(generator):generator for generator in _mazeGenerators}
 mazePrinters = {_keyFunc(printer):printer for printer in _mazePrinters}
 
+# Splits each name:value option on its first colon
+def _parseNamedArgs(argList):
+    if argList is None:
+        return {}
+    parsed = {}
+    for arg in argList:
+        (name, sep, value) = arg.partition(':')
+        if not sep:
+            raise Exception('Extra options must be in name:value format, got {:s}'.format(arg))
+        parsed[name] = value
+    return parsed
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('width', type=int, help='Width of your maze')
@@ -882,12 +967,12 @@ if __name__ == '__main__':
     parser.add_argument('seed', type=int, help='Seed for the resulting maze')
     parser.add_argument('--generator', choices=mazeGenerators.keys(), default=_keyFunc(_mazeGenerators[0]), help='Which generator to use to generate the maze')
     parser.add_argument('--printer', choices=mazePrinters.keys(), default=_keyFunc(_mazePrinters[0]), help='Which printer to use to output the maze; default is %(default)s')
-    parser.add_argument('--gen-arg', action='append', help='Add extra options in name:value format to the generator command')
+    parser.add_argument('--gen-arg', action='append', help='Add extra options in name:value format to the generator command; fastRng:true carves faster, but gives a different maze for the same seed')
     parser.add_argument('--print-arg', action='append', help='Add extra options in name:value format to the print command')
 
     args = parser.parse_args()
 
-    genargs = {arg[0:arg.index(':')]:arg[arg.index(':')+1:] for arg in args.gen_arg} if args.gen_arg is not None else {}
-    printargs = {arg[0:arg.index(':')]:arg[arg.index(':')+1:] for arg in args.print_arg} if args.print_arg is not None else {}
+    genargs = _parseNamedArgs(args.gen_arg)
+    printargs = _parseNamedArgs(args.print_arg)
 
     print(mazePrinters.get(args.printer)().print(mazeGenerators.get(args.generator)().generate(args.width, args.height, args.seed, genargs), printargs))